@@ -9,13 +9,58 @@ Date: June 2025
 """
 
 # Importing required libraries
+import argparse  # For reading paths from the command line
 import sqlite3  # For connecting to SQLite database
+from concurrent.futures import ThreadPoolExecutor  # For running both approaches at once
+from itertools import zip_longest  # For pairing rows of unequal length
 import pandas as pd  # For data manipulation and analysis
-from typing import List, Tuple  # For type hinting
+from pathlib import Path  # For building file system paths
+from typing import Iterator, List, Optional, Tuple, Union  # For type hinting
 
 
 # Define a class to encapsulate the entire analytics logic
 class SalesAnalytics:
+    # SQL query to extract age-18–35 customer purchase patterns
+    # (shared by the SQL and Pandas approaches)
+    _SQL_QUERY = """
+    SELECT 
+        c.customer_id,
+        c.age,
+        i.item_name,
+        CAST(SUM(o.quantity) AS INTEGER) as total_quantity
+    FROM Customers c
+    INNER JOIN Sales s ON c.customer_id = s.customer_id
+    INNER JOIN Orders o ON s.sales_id = o.sales_id
+    INNER JOIN Items i ON o.item_id = i.item_id
+    WHERE c.age BETWEEN ? AND ?
+    AND o.quantity > 0
+    GROUP BY c.customer_id, c.age, i.item_name
+    ORDER BY c.customer_id, i.item_name;
+    """
+
+    # Target age range, bound to the placeholders in _SQL_QUERY
+    _AGE_RANGE = (18, 35)
+
+    # Covering indexes for the join and filter columns used by _SQL_QUERY
+    # (Items is looked up by its INTEGER PRIMARY KEY, so it needs none)
+    _INDEX_SCRIPT = """
+    CREATE INDEX IF NOT EXISTS idx_customers_age ON Customers(age, customer_id);
+    CREATE INDEX IF NOT EXISTS idx_sales_customer ON Sales(customer_id, sales_id);
+    CREATE INDEX IF NOT EXISTS idx_orders_sales ON Orders(sales_id, item_id, quantity);
+    """
+
+    # Per-connection settings for the read-only analysis: 256 MB page
+    # cache, in-memory temp B-trees, 1 GB mmap and no writes from here on
+    _PRAGMA_SCRIPT = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-262144;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA query_only=1;
+    """
+
+    # Column headers used for every exported CSV
+    _CSV_COLUMNS = ['Customer', 'Age', 'Item', 'Quantity']
+
     def __init__(self, db_path: str):
         # Initialize with the path to the database
         self.db_path = db_path
@@ -25,162 +70,210 @@ class SalesAnalytics:
         # Try to connect to the SQLite database
         try:
             self.connection = sqlite3.connect(self.db_path)
+
+            # Make sure the join/filter indexes exist before querying; this is
+            # best-effort, since a read-only database can still be analyzed
+            try:
+                self.connection.executescript(self._INDEX_SCRIPT)
+            except sqlite3.OperationalError as e:
+                print(f"Could not create indexes, continuing without them: {e}")
+
+            # The analysis only reads from here on
+            self._apply_pragmas(self.connection)
             print(f"Successfully connected to database: {self.db_path}")
             return True
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             return False
 
+    def _apply_pragmas(self, connection: sqlite3.Connection):
+        # Tune the connection; these settings only affect speed, so a
+        # failure is logged rather than treated as a connection error
+        try:
+            connection.executescript(self._PRAGMA_SCRIPT)
+        except sqlite3.OperationalError as e:
+            print(f"Could not apply connection settings, using defaults: {e}")
+
+    def _open_reader_connection(self) -> sqlite3.Connection:
+        # Open an extra read-only connection for use in a worker thread
+        # (sqlite3 connections must not be shared between threads)
+        connection = sqlite3.connect(self.db_path)
+        self._apply_pragmas(connection)
+        return connection
+
     def close_connection(self):
         # Close the connection if it's open
         if self.connection:
             self.connection.close()
             print("Database connection closed.")
 
-    def extract_data_sql_approach(self) -> List[Tuple]:
-        # SQL query to extract age-18–35 customer purchase patterns
-        sql_query = """
-        SELECT 
-            c.customer_id,
-            c.age,
-            i.item_name,
-            CAST(SUM(o.quantity) AS INTEGER) as total_quantity
-        FROM Customers c
-        INNER JOIN Sales s ON c.customer_id = s.customer_id
-        INNER JOIN Orders o ON s.sales_id = o.sales_id
-        INNER JOIN Items i ON o.item_id = i.item_id
-        WHERE c.age BETWEEN 18 AND 35
-        AND o.quantity IS NOT NULL
-        AND o.quantity > 0
-        GROUP BY c.customer_id, c.age, i.item_name
-        HAVING SUM(o.quantity) > 0
-        ORDER BY c.customer_id, i.item_name;
-        """
-
-        # Execute query and fetch results
+    def extract_data_sql_approach(self, chunk_size: int = 50000) -> Iterator[List[Tuple]]:
+        # Execute query and stream the results in chunks of rows, so the
+        # full result set is never held in memory at once; errors propagate
+        # to the consumer so a failed query is not mistaken for end of data
+        cursor = self.connection.cursor()
+        cursor.execute(self._SQL_QUERY, self._AGE_RANGE)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def extract_data_pandas_approach(self, connection: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+        # Pandas-based approach to extract and analyze customer purchases,
+        # on the given connection or the main one
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql_query)
-            results = cursor.fetchall()
-            print(f"SQL Approach: Retrieved {len(results)} records")
-            return results
-        except sqlite3.Error as e:
-            print(f"Error executing SQL query: {e}")
-            return []
-
-    def extract_data_pandas_approach(self) -> pd.DataFrame:
-        # Pandas-based approach to extract and analyze customer purchases
-        try:
-            # Load all tables into pandas DataFrames
-            customers_df = pd.read_sql_query("SELECT * FROM Customers", self.connection)
-            sales_df = pd.read_sql_query("SELECT * FROM Sales", self.connection)
-            orders_df = pd.read_sql_query("SELECT * FROM Orders", self.connection)
-            items_df = pd.read_sql_query("SELECT * FROM Items", self.connection)
-
-            # Filter customers aged 18 to 35
-            customers_filtered = customers_df[
-                (customers_df['age'] >= 18) & (customers_df['age'] <= 35)
-            ]
-
-            # Merge customer → sales → orders → items
-            merged_df = (customers_filtered
-                         .merge(sales_df, on='customer_id')
-                         .merge(orders_df, on='sales_id')
-                         .merge(items_df, on='item_id'))
-
-            # Filter rows where quantity is non-null and positive
-            merged_df = merged_df[
-                (merged_df['quantity'].notna()) & (merged_df['quantity'] > 0)
-            ]
-
-            # Group by customer, age, and item, then sum quantity
-            result_df = (merged_df
-                         .groupby(['customer_id', 'age', 'item_name'])['quantity']
-                         .sum()
-                         .reset_index())
-
-            # Ensure quantity is an integer
-            result_df['quantity'] = result_df['quantity'].astype(int)
-
-            # Optional safety check: remove zero quantities
-            result_df = result_df[result_df['quantity'] > 0]
-
-            # Sort results for consistency
-            result_df = result_df.sort_values(['customer_id', 'item_name']).reset_index(drop=True)
-
-            print(f"Pandas Approach: Retrieved {len(result_df)} records")
+            # Let SQLite perform the join, filter and aggregation so only
+            # the final result rows are transferred into pandas
+            result_df = pd.read_sql_query(self._SQL_QUERY, connection or self.connection,
+                                          params=self._AGE_RANGE)
+
+            # Ages are limited to 18–35 by the query, so int8 is enough;
+            # the summed quantity keeps int64 to avoid overflow
+            result_df['age'] = result_df['age'].astype('int8')
+
+            # Item names repeat for every customer, so store them as
+            # category codes; to_csv writes the original strings back out
+            result_df['item_name'] = result_df['item_name'].astype('category')
             return result_df
 
         except Exception as e:
             print(f"Error in pandas approach: {e}")
             return pd.DataFrame()
 
-    def save_to_csv(self, data, filename: str, approach: str = "sql"):
-        # Save results to CSV file with semicolon (;) as delimiter
+    def _extract_pandas_in_thread(self) -> pd.DataFrame:
+        # Run the Pandas approach on its own connection (worker thread entry point)
+        try:
+            connection = self._open_reader_connection()
+        except sqlite3.Error as e:
+            print(f"Error in pandas approach: {e}")
+            return pd.DataFrame()
+
+        try:
+            return self.extract_data_pandas_approach(connection)
+        finally:
+            connection.close()
+
+    def save_to_csv(self, data, filename: Union[str, Path], approach: str = "sql") -> Optional[int]:
+        # Save results to CSV file with semicolon (;) as delimiter and
+        # return the number of rows written, or None if saving failed.
+        # The file is written under a temporary name and renamed only on
+        # success, so a failed run never leaves a partial CSV behind.
+        filename = Path(filename)
+        tmp_filename = filename.with_name(filename.name + ".tmp")
         try:
             if approach == "sql":
-                # Convert list of tuples to DataFrame
-                df = pd.DataFrame(data, columns=['Customer', 'Age', 'Item', 'Quantity'])
+                # Append each chunk of tuples to the file as it arrives,
+                # writing the header only once
+                row_count = 0
+                df = pd.DataFrame(columns=self._CSV_COLUMNS)
+                with open(tmp_filename, 'w', newline='', encoding='utf-8') as f:
+                    for chunk in data:
+                        chunk_df = pd.DataFrame(chunk, columns=self._CSV_COLUMNS)
+                        chunk_df.to_csv(f, sep=';', index=False, header=(row_count == 0))
+                        if row_count == 0:
+                            # Keep the first chunk for the preview below
+                            df = chunk_df
+                        row_count += len(chunk_df)
+
+                    if row_count == 0:
+                        # Still write the header for an empty result
+                        df.to_csv(f, sep=';', index=False)
             else:
                 # Rename columns for consistency
                 df = data.copy()
-                df.columns = ['Customer', 'Age', 'Item', 'Quantity']
+                df.columns = self._CSV_COLUMNS
 
-            # Save to CSV
-            df.to_csv(filename, sep=';', index=False)
+                # Save to CSV
+                df.to_csv(tmp_filename, sep=';', index=False)
+                row_count = len(df)
+
+            tmp_filename.replace(filename)
             print(f"Data successfully saved to {filename}")
 
-            # Display data preview
+            # Display a fixed-size preview rather than the whole result
             print("\nPreview of saved data:")
-            print(df.to_string(index=False))
+            print(df.head(10).to_string(index=False))
+            print(f"... ({row_count} rows total)")
+            return row_count
 
         except Exception as e:
             print(f"Error saving to CSV: {e}")
+            tmp_filename.unlink(missing_ok=True)
+            return None
+
+    def analyze_sales_data(self, output_filename: str = "sales_analysis.csv",
+                           output_dir: Union[str, Path] = "output", verify: bool = False):
+        # Entry point for analyzing and exporting the results; the Pandas
+        # approach and the cross-check only run when verify is set
+
+        # Create the output directory up front, so a bad path fails
+        # before any query runs
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
 
-    def analyze_sales_data(self, output_filename: str = "sales_analysis.csv", output_dir: str = "output"):
-        # Entry point for analyzing and exporting both approaches
         print("=" * 60)
         print("SALES DATA ANALYSIS")
         print("=" * 60)
 
-        # --- SQL-based extraction ---
-        print("\nSOLUTION 1: Pure SQL Approach")
-        print("-" * 40)
-        sql_results = self.extract_data_sql_approach()
-        if sql_results:
-            sql_filename = f"{output_dir}/sql_{output_filename}"
-            self.save_to_csv(sql_results, sql_filename, "sql")
+        sql_filename = out / f"sql_{output_filename}"
+        if not verify:
+            return self._export_sql_results(sql_filename), None
+
+        # The two approaches are independent reads, so the Pandas query runs
+        # on a worker thread while the SQL results stream to disk here;
+        # sqlite3 releases the GIL while it executes, so both make progress
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pandas_future = executor.submit(self._extract_pandas_in_thread)
+            sql_count = self._export_sql_results(sql_filename)
+            pandas_results = pandas_future.result()
 
         # --- Pandas-based extraction ---
         print("\nSOLUTION 2: Pandas Approach")
         print("-" * 40)
-        pandas_results = self.extract_data_pandas_approach()
+        print(f"Pandas Approach: Retrieved {len(pandas_results)} records")
         if not pandas_results.empty:
-            pandas_filename = f"{output_dir}/pandas_{output_filename}"
+            pandas_filename = out / f"pandas_{output_filename}"
             self.save_to_csv(pandas_results, pandas_filename, "pandas")
 
         # --- Verification of consistency ---
-        if sql_results and not pandas_results.empty:
-            self._verify_results(sql_results, pandas_results)
+        if sql_count and not pandas_results.empty:
+            self._verify_results(sql_filename, pandas_results)
 
-        return sql_results, pandas_results
+        return sql_count, pandas_results
 
-    def _verify_results(self, sql_results: List[Tuple], pandas_results: pd.DataFrame):
-        # Compares SQL and Pandas results to ensure they match
+    def _export_sql_results(self, sql_filename: Path) -> Optional[int]:
+        # Streams the SQL approach results to CSV and reports the row count
+        print("\nSOLUTION 1: Pure SQL Approach")
+        print("-" * 40)
+        sql_count = self.save_to_csv(self.extract_data_sql_approach(), sql_filename, "sql")
+        if sql_count is not None:
+            print(f"SQL Approach: Retrieved {sql_count} records")
+        return sql_count
+
+    def _verify_results(self, sql_filename: Path, pandas_results: pd.DataFrame,
+                        chunk_size: int = 50000):
+        # Compares the exported SQL CSV with the Pandas results to ensure
+        # they match, so the check covers the rows actually written to disk
         print("\nVERIFICATION: Comparing Results")
         print("-" * 40)
 
-        # Convert both to DataFrames
-        sql_df = pd.DataFrame(sql_results, columns=['Customer', 'Age', 'Item', 'Quantity'])
-        pandas_df = pandas_results.copy()
-        pandas_df.columns = ['Customer', 'Age', 'Item', 'Quantity']
-
-        # Sort for row-by-row comparison
-        sql_df = sql_df.sort_values(['Customer', 'Item']).reset_index(drop=True)
-        pandas_df = pandas_df.sort_values(['Customer', 'Item']).reset_index(drop=True)
-
-        # Compare for equality
-        if sql_df.equals(pandas_df):
+        # Read the CSV back in chunks; Item stays a string even if it looks
+        # numeric or empty, so it compares equal to the value from SQLite
+        with pd.read_csv(sql_filename, sep=';', dtype={'Item': str},
+                         keep_default_na=False, chunksize=chunk_size) as reader:
+            # Both results are already ordered by customer and item, so
+            # compare them pairwise without building or re-sorting frames
+            sql_rows = (row for chunk in reader
+                        for row in chunk.itertuples(index=False, name=None))
+            pandas_rows = pandas_results.itertuples(index=False, name=None)
+            missing = object()  # Pads the shorter side so a length mismatch fails
+
+            # Compare for equality
+            identical = all(sql_row == pandas_row for sql_row, pandas_row
+                            in zip_longest(sql_rows, pandas_rows, fillvalue=missing))
+
+        if identical:
             print("Both approaches produce identical results!")
         else:
             print("Results differ between approaches. This needs investigation.")
@@ -188,14 +281,26 @@ class SalesAnalytics:
 
 # Main script execution starts here
 def main():
-    # Set the path to your SQLite database file
-    db_path = "D:/sales-analytics/data/Data Engineer_ETL Assignment 1.db"
-
-    # Define the directory where output CSVs will be saved
-    output_path = "D:/sales-analytics/output"
+    # Default paths are relative to the project root (one level above src/)
+    project_root = Path(__file__).resolve().parent.parent
+
+    parser = argparse.ArgumentParser(description="Extract purchase patterns of customers aged 18–35.")
+    parser.add_argument("--db-path", type=Path,
+                        default=project_root / "data" / "Data Engineer_ETL Assignment 1.db",
+                        help="path to the SQLite database file")
+    parser.add_argument("--output-dir", type=Path, default=project_root / "output",
+                        help="directory where output CSVs will be saved")
+    parser.add_argument("--verify", action="store_true",
+                        help="also run the Pandas approach and check it matches the SQL results")
+    args = parser.parse_args()
+
+    # sqlite3.connect would silently create a missing file, so check first
+    if not args.db_path.is_file():
+        print(f"Database file not found: {args.db_path}")
+        return
 
     # Create an instance of the SalesAnalytics class
-    analytics = SalesAnalytics(db_path)
+    analytics = SalesAnalytics(str(args.db_path))
 
     try:
         # Connect to database
@@ -204,15 +309,17 @@ def main():
             return
 
         # Run the full analysis
-        analytics.analyze_sales_data("sales_analysis.csv", output_dir=output_path)
+        analytics.analyze_sales_data("sales_analysis.csv", output_dir=args.output_dir,
+                                     verify=args.verify)
 
         # Final confirmation
         print("\n" + "=" * 60)
         print("ANALYSIS COMPLETE")
         print("=" * 60)
         print("Generated files:")
-        print("• output/sql_sales_analysis.csv")
-        print("• output/pandas_sales_analysis.csv")
+        print(f"• {args.output_dir / 'sql_sales_analysis.csv'}")
+        if args.verify:
+            print(f"• {args.output_dir / 'pandas_sales_analysis.csv'}")
 
     except Exception as e:
         print(f"An error occurred during analysis: {e}")